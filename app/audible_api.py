@@ -6,9 +6,19 @@ Handles all interactions with the Audible CLI and API calls.
 import subprocess
 import json
 import os
-import sys
-from typing import Dict, List, Optional
-from config import CONFIG_DIR, AUDIBLE_TIMEOUT, FILENAME_MODE, AUDIOBOOK_DOWNLOAD_DIR
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import AUDIBLE_BIN, CONFIG_DIR, AUDIBLE_TIMEOUT, AUDIBLE_API_TIMEOUT, DOWNLOAD_TIMEOUT_PER_BOOK, FILENAME_MODE, AUDIOBOOK_DOWNLOAD_DIR, CACHE_DIR, ACTIVATION_CACHE_PATH, LIBRARY_CACHE_PATH, LIBRARY_TTL_SECONDS
+
+# orjson is optional; it parses large library responses several times faster
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+# Printed by audible download when a title can't be downloaded
+NOT_DOWNLOADABLE_MESSAGE = "is not downloadable"
 
 
 class AudibleAPI:
@@ -16,181 +26,248 @@ class AudibleAPI:
     
     def __init__(self):
         self.activation_bytes = self._get_activation_bytes()
+        # Successful book detail responses by ASIN tuple; failures are not stored so they get retried
+        self._book_details_cache: Dict[Tuple[str, ...], Dict] = {}
     
     def _get_activation_bytes(self) -> str:
         """Get and validate activation bytes."""
         try:
+            # Reuse cached activation bytes if the config files haven't changed since
+            cached = self._load_cached_activation_bytes()
+            if cached:
+                return cached
+            
             # Get activation bytes
-            subprocess.run(["audible", "activation-bytes"], check=True)
+            subprocess.run([AUDIBLE_BIN, "activation-bytes"], check=True, timeout=AUDIBLE_API_TIMEOUT)
             
             # Find the JSON file with activation bytes
-            json_files = [f for f in os.listdir(CONFIG_DIR) if f.endswith('.json')]
+            with os.scandir(CONFIG_DIR) as entries:
+                json_files = [e.path for e in entries if e.is_file() and e.name.endswith('.json')]
             if not json_files:
                 raise Exception("No activation bytes JSON file found")
             
-            with open(os.path.join(CONFIG_DIR, json_files[0]), 'r') as f:
+            with open(json_files[0], 'r') as f:
                 data = json.load(f)
                 activation_bytes = data.get("activation_bytes")
             
             if not activation_bytes:
                 raise Exception("No activation bytes found in JSON file")
             
+            self._save_cached_activation_bytes(activation_bytes)
             return activation_bytes
             
         except Exception as e:
             print(f"Error getting activation bytes: {e}")
-            sys.stdout.flush()
             raise
     
+    def _get_config_mtime(self) -> float:
+        """Get the newest modification time of the JSON files in the config directory."""
+        with os.scandir(CONFIG_DIR) as entries:
+            mtimes = [e.stat().st_mtime for e in entries 
+                      if e.is_file() and e.name.endswith('.json')]
+        return max(mtimes, default=0.0)
+    
+    def _load_cached_activation_bytes(self) -> Optional[str]:
+        """Return cached activation bytes if the cache is newer than the config files."""
+        try:
+            with open(ACTIVATION_CACHE_PATH, 'r') as f:
+                cache = json.load(f)
+            
+            if cache.get("mtime", 0) >= self._get_config_mtime():
+                return cache.get("bytes")
+            return None
+            
+        except (OSError, ValueError):
+            return None
+    
+    def _save_cached_activation_bytes(self, activation_bytes: str):
+        """Persist activation bytes so later runs can skip the audible CLI."""
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(ACTIVATION_CACHE_PATH, 'w') as f:
+                json.dump({"bytes": activation_bytes, "mtime": self._get_config_mtime()}, f)
+        except OSError as e:
+            print(f"Warning: could not cache activation bytes: {e}")
+    
     def update_library(self) -> bool:
         """Update library from Audible and return success status."""
         try:
             print("Updating library from Audible...")
-            sys.stdout.flush()
             
             # Use the JSON API approach instead of export
-            return True  # We'll get data directly in get_library_data
+            return True  # We'll get data directly in iter_library_data
             
         except Exception as e:
             print(f"Error updating library: {e}")
-            sys.stdout.flush()
             return False
     
-    def get_library_data(self) -> List[Dict]:
-        """Get library data directly from Audible CLI JSON API."""
+    def iter_library_data(self) -> Iterator[Dict]:
+        """Yield library books one at a time in the format expected by the database."""
         try:
-            # Use Audible CLI to get library as JSON (simplified approach)
-            result = subprocess.run(
-                ["audible", "library", "list"],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            if result.returncode != 0:
-                print(f"Error getting library: {result.stderr}")
-                sys.stdout.flush()
-                return []
+            output = self._read_library_output()
+            if output is None:
+                return
             
             # Try to parse as JSON if available, otherwise parse the text output
             try:
-                library_data = json.loads(result.stdout)
+                library_data = _json.loads(output)
                 items = library_data.get("items", [])
             except json.JSONDecodeError:
                 # If not JSON, parse the text output format
                 print("Parsing library text output...")
-                sys.stdout.flush()
-                items = self._parse_library_text_output(result.stdout)
-            
-            # Convert to the format expected by the database
-            books = []
-            for item in items:
-                if isinstance(item, dict):
-                    book = {
-                        'title': item.get('title', ''),
-                        'authors': ', '.join([author.get('name', '') for author in item.get('authors', [])]) if item.get('authors') else item.get('authors', ''),
-                        'asin': item.get('asin', '')
-                    }
-                    books.append(book)
-            
-            return books
+                items = self._parse_library_text_output(output.decode(errors='replace'))
             
         except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
             print(f"Error getting library: {e}")
-            sys.stdout.flush()
-            return []
+            return
         except Exception as e:
             print(f"Error reading library: {e}")
-            sys.stdout.flush()
-            return []
+            return
+        
+        # Convert lazily so callers can insert in chunks without a second full copy of the library
+        for item in items:
+            if isinstance(item, dict):
+                yield {
+                    'title': item.get('title', ''),
+                    'authors': ', '.join([author.get('name', '') for author in item.get('authors', [])]) if item.get('authors') else item.get('authors', ''),
+                    'asin': item.get('asin', '')
+                }
+    
+    def _read_library_output(self) -> Optional[bytes]:
+        """Return the raw library listing, reusing the cached copy while it is fresh."""
+        try:
+            if time.time() - os.path.getmtime(LIBRARY_CACHE_PATH) < LIBRARY_TTL_SECONDS:
+                with open(LIBRARY_CACHE_PATH, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass  # No usable cache; fetch from Audible
+        
+        # Use Audible CLI to get library as JSON (simplified approach)
+        result = subprocess.run(
+            [AUDIBLE_BIN, "library", "list"],
+            capture_output=True,
+            timeout=AUDIBLE_API_TIMEOUT
+        )
+        
+        if result.returncode != 0:
+            print(f"Error getting library: {result.stderr.decode(errors='replace')}")
+            return None
+        
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(LIBRARY_CACHE_PATH, 'wb') as f:
+                f.write(result.stdout)
+        except OSError as e:
+            print(f"Warning: could not cache library listing: {e}")
+        
+        return result.stdout
     
     def _parse_library_text_output(self, output: str) -> List[Dict]:
         """Parse text-based library output if JSON is not available."""
         # This is a fallback - in practice, we may need to implement based on actual output format
         # For now, return empty list and let the system continue
         print("Text parsing not yet implemented - using empty library")
-        sys.stdout.flush()
         return []
     
-    def get_book_details(self, asins: List[str]) -> Optional[Dict]:
-        """Get detailed book information from the API."""
+    def get_book_details(self, asins: Tuple[str, ...]) -> Optional[Dict]:
+        """Get detailed book information from the API (successful responses are cached per ASIN tuple)."""
+        cached = self._book_details_cache.get(asins)
+        if cached is not None:
+            return cached
+        
         try:
             asin_list = ','.join(asins)
             result = subprocess.run([
-                "audible", "api", "1.0/library",
+                AUDIBLE_BIN, "api", "1.0/library",
                 "-p", f"asins={asin_list}",
                 "-p", "response_groups=product_desc,product_attrs",
                 "-f", "json"
-            ], capture_output=True, text=True)
+            ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=AUDIBLE_API_TIMEOUT)
             
-            if result.returncode == 0 and result.stdout:
-                return json.loads(result.stdout)
-            return None
+            # Parse the raw bytes, skipping a separate text decode
+            try:
+                data = _json.loads(result.stdout)
+            except json.JSONDecodeError:
+                data = None
             
-        except Exception as e:
-            print(f"Error getting book details: {e}")
-            sys.stdout.flush()
+            if result.returncode == 0 and data:
+                self._book_details_cache[asins] = data
+                return data
             return None
-    
-    def get_single_book_details(self, asin: str) -> Optional[Dict]:
-        """Get detailed information for a single book."""
-        try:
-            result = subprocess.run([
-                "audible", "api", "1.0/library",
-                "-p", f"asins={asin}",
-                "-p", "response_groups=product_desc,product_attrs",
-                "-f", "json"
-            ], capture_output=True, text=True)
             
-            if result.returncode == 0 and result.stdout:
-                data = json.loads(result.stdout)
-                items = data.get('items', [])
-                return items[0] if items else None
+        except subprocess.TimeoutExpired:
+            print(f"Timed out getting book details for {asin_list}")
             return None
-            
         except Exception as e:
-            print(f"Error getting single book details for {asin}: {e}")
-            sys.stdout.flush()
+            print(f"Error getting book details: {e}")
             return None
     
-    def download_book(self, asin: str) -> bool:
-        """Download a book by ASIN."""
+    def download_book(self, asin: str) -> Tuple[bool, Optional[str]]:
+        """Download a book by ASIN and return (success, restriction reason if not downloadable)."""
+        returncode, not_downloadable = self._run_download([asin])
+        
+        # The CLI skips restricted titles with a message, sometimes still exiting 0
+        if not_downloadable:
+            return False, "Not downloadable (reported by audible download)"
+        
+        return returncode == 0, None
+    
+    def download_books(self, asins: List[str]) -> bool:
+        """Download several books with a single audible CLI invocation."""
+        returncode, not_downloadable = self._run_download(asins)
+        return returncode == 0 and not not_downloadable
+    
+    def _run_download(self, asins: List[str]) -> Tuple[Optional[int], bool]:
+        """Run audible download once, streaming its output, and return (returncode, not_downloadable)."""
         try:
-            print(f"Downloading audiobook with ASIN: {asin}")
-            sys.stdout.flush()
+            print(f"Downloading audiobooks with ASINs: {', '.join(asins)}")
             
-            result = subprocess.run([
-                "audible", "-v", "error", "download", 
-                "-a", asin, 
+            asin_args = []
+            for asin in asins:
+                asin_args += ["-a", asin]
+            
+            process = subprocess.Popen([
+                AUDIBLE_BIN, "-v", "error", "download", 
+                *asin_args, 
                 "--aax-fallback", 
                 "--timeout", AUDIBLE_TIMEOUT, 
                 "-f", FILENAME_MODE, 
                 "--ignore-podcasts", 
                 "-o", AUDIOBOOK_DOWNLOAD_DIR
-            ])
-            
-            return result.returncode == 0
+            ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace', bufsize=1)
             
-        except Exception as e:
-            print(f"Error downloading {asin}: {e}")
-            sys.stdout.flush()
-            return False
-    
-    def check_download_error(self, asin: str) -> Optional[str]:
-        """Check if a download attempt returns a specific error message."""
-        try:
-            result = subprocess.run(
-                ["audible", "download", "-a", asin, "--aax-fallback"], 
-                capture_output=True, text=True, timeout=30
-            )
+            # Kill a hung download; the read loop below ends once the pipe closes
+            timed_out = threading.Event()
+            def kill():
+                timed_out.set()
+                process.kill()
+            watchdog = threading.Timer(DOWNLOAD_TIMEOUT_PER_BOOK * len(asins), kill)
+            watchdog.start()
             
-            if "is not downloadable" in result.stdout:
-                return "Detected as non-downloadable during download attempt"
+            # Echo each line to the log as it arrives while checking it for restrictions
+            not_downloadable = False
+            try:
+                with process.stdout:
+                    for line in process.stdout:
+                        print(line, end='')
+                        if NOT_DOWNLOADABLE_MESSAGE in line:
+                            not_downloadable = True
+                returncode = process.wait()
+            finally:
+                watchdog.cancel()
+                # Don't leave the CLI running if reading its output failed
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
             
-            return None
+            if timed_out.is_set():
+                print(f"Timed out downloading {', '.join(asins)}")
+                return None, not_downloadable
+            return returncode, not_downloadable
             
-        except Exception:
-            return None
+        except Exception as e:
+            print(f"Error downloading {', '.join(asins)}: {e}")
+            return None, False
 
 
 # Global API instance
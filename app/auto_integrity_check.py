@@ -19,16 +19,53 @@ config = "/config"
 audiobook_directory = "/audiobooks"
 use_folders = True if os.getenv('AUDIOBOOK_FOLDERS') == "True" else False
 
-def verify_and_fix():
-    """Perform integrity verification and automatic fixes."""
+# Connection tuning - matches database.py so this check keeps the WAL journal
+sqlite_pragmas = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+    "busy_timeout=5000",
+)
+
+def scan_audiobook_files(directory, files_by_asin):
+    """Recursively index audiobook files as (path, size) by ASIN prefix, reusing the scandir stat."""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    scan_audiobook_files(entry.path, files_by_asin)
+                elif entry.name.endswith(('.m4b', '.aax', '.aaxc')):
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = None  # Listed but can't be accessed
+                    file_asin = os.path.splitext(entry.name)[0].partition('_')[0]
+                    files_by_asin.setdefault(file_asin, []).append((entry.path, size))
+    except OSError:
+        pass  # Unreadable directory; its books are reported as missing
+    return files_by_asin
+
+def verify_and_fix(con=None):
+    """Perform integrity verification and automatic fixes.
+    
+    Pass an open connection to reuse it; otherwise short-lived connections are opened.
+    """
     try:
-        con = sqlite3.connect(config + "/audiobooks.db")
-        cur = con.cursor()
+        db_path = config + "/audiobooks.db"
+        
+        # Read through a read-only connection so the downloader's writers aren't blocked
+        reader = con or sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        if reader is not con:
+            reader.execute("PRAGMA busy_timeout=5000")
         
         # Get books marked as downloaded
-        books = cur.execute('''
+        books = reader.execute('''
             SELECT asin, title, authors FROM audiobooks WHERE downloaded = 1
         ''').fetchall()
+        if reader is not con:
+            reader.close()
         
         missing_asins = []
         corrupted_files = []
@@ -36,16 +73,11 @@ def verify_and_fix():
         
         print(f"🔍 Checking {len(books)} downloaded books...")
         
+        # Walk the library once and index audiobook files by their ASIN prefix
+        files_by_asin = scan_audiobook_files(audiobook_directory, {})
+        
         for asin, title, authors in books:
-            # Quick check for file existence using glob pattern
-            found_files = []
-            
-            # Search for audiobook files with this ASIN
-            for root, dirs, files in os.walk(audiobook_directory):
-                for file in files:
-                    if file.startswith(asin) and file.endswith(('.m4b', '.aax', '.aaxc')):
-                        filepath = os.path.join(root, file)
-                        found_files.append(filepath)
+            found_files = files_by_asin.get(asin, [])
             
             if not found_files:
                 missing_asins.append(asin)
@@ -53,18 +85,8 @@ def verify_and_fix():
                 print(f"   📋 Missing: {title} by {authors}")
             else:
                 # Quick integrity check using file size (corrupted files are often 0 bytes or very small)
-                for filepath in found_files:
-                    try:
-                        file_size = os.path.getsize(filepath)
-                        if file_size < 1024 * 1024:  # Less than 1MB is likely corrupted
-                            corrupted_files.append({
-                                'asin': asin,
-                                'file': filepath,
-                                'book': f"{title} by {authors}"
-                            })
-                            issues_found += 1
-                            print(f"   🔥 Corrupted: {title} by {authors} (size: {file_size} bytes)")
-                    except OSError:
+                for filepath, file_size in found_files:
+                    if file_size is None:
                         # File exists in directory listing but can't be accessed
                         corrupted_files.append({
                             'asin': asin,
@@ -73,39 +95,58 @@ def verify_and_fix():
                         })
                         issues_found += 1
                         print(f"   🔥 Inaccessible: {title} by {authors}")
+                    elif file_size < 1024 * 1024:  # Less than 1MB is likely corrupted
+                        corrupted_files.append({
+                            'asin': asin,
+                            'file': filepath,
+                            'book': f"{title} by {authors}"
+                        })
+                        issues_found += 1
+                        print(f"   🔥 Corrupted: {title} by {authors} (size: {file_size} bytes)")
         
         # Apply fixes
         if issues_found > 0:
             print(f"🔧 Fixing {issues_found} issues...")
-            fixed = 0
             
-            # Fix missing files
-            for asin in missing_asins:
-                try:
-                    cur.execute('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?', [asin])
-                    fixed += 1
-                except sqlite3.Error as e:
-                    print(f"   ❌ Error resetting ASIN {asin}: {e}")
+            # Missing files only need their download status reset
+            reset_asins = list(missing_asins)
             
-            # Fix corrupted files
+            # Remove corrupted files, then reset their download status too
             for item in corrupted_files:
                 try:
-                    # Remove corrupted file
                     if os.path.exists(item['file']):
                         os.remove(item['file'])
-                    
-                    # Reset download status
-                    cur.execute('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?', [item['asin']])
-                    fixed += 1
-                except (OSError, sqlite3.Error) as e:
+                    reset_asins.append(item['asin'])
+                except OSError as e:
                     print(f"   ❌ Error fixing {item['asin']}: {e}")
             
-            con.commit()
+            # Open a write connection only now, and apply every reset in one transaction
+            fixed = 0
+            writer = con or sqlite3.connect(db_path)
+            try:
+                if writer is not con:
+                    for pragma in sqlite_pragmas:
+                        writer.execute(f"PRAGMA {pragma}")
+                # Explicit BEGIN/COMMIT works whether or not the connection is in autocommit mode
+                writer.execute("BEGIN")
+                try:
+                    writer.executemany('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?',
+                                       [(asin,) for asin in reset_asins])
+                except sqlite3.Error:
+                    writer.execute("ROLLBACK")
+                    raise
+                writer.execute("COMMIT")
+                fixed = len(reset_asins)
+            except sqlite3.Error as e:
+                print(f"   ❌ Error resetting download status: {e}")
+            finally:
+                if writer is not con:
+                    writer.close()
+            
             print(f"✅ Fixed {fixed} issues - books will be re-downloaded")
         else:
             print("✅ No issues found")
         
-        con.close()
         return issues_found
         
     except Exception as e:
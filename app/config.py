@@ -4,6 +4,7 @@ Contains all configuration constants and environment settings.
 """
 
 import os
+import shutil
 import sys
 
 # Ensure stdout is flushed immediately for Docker logging
@@ -17,13 +18,34 @@ AUDIOBOOK_DIR = "/audiobooks"
 # Environment settings
 USE_FOLDERS = True if os.getenv('AUDIOBOOK_FOLDERS') == "True" else False
 
+# Cache directory for values that survive between download cycles
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "audible-downloader")
+ACTIVATION_CACHE_PATH = os.path.join(CACHE_DIR, "activation.json")
+LIBRARY_CACHE_PATH = os.path.join(CACHE_DIR, "library.json")
+LIBRARY_TTL_SECONDS = int(os.getenv('LIBRARY_TTL_SECONDS', '3600'))  # Reuse the library listing for this long
+
 # Database configuration
 DATABASE_PATH = os.path.join(CONFIG_DIR, "audiobooks.db")
 
+# External tools, resolved on PATH once at startup
+AUDIBLE_BIN = shutil.which("audible") or "audible"
+FFMPEG_BIN = shutil.which("ffmpeg") or "ffmpeg"
+
 # Audible CLI configuration
 AUDIBLE_TIMEOUT = "0"  # No timeout for downloads
+AUDIBLE_API_TIMEOUT = 300  # Seconds before a hung metadata/API call is killed
+DOWNLOAD_TIMEOUT_PER_BOOK = 3600  # Seconds allowed per book before a hung download is killed
 DOWNLOAD_QUALITY = "best"
 FILENAME_MODE = "asin_ascii"
 
 # Batch processing settings
-API_BATCH_SIZE = 20  # Number of books to check in one API call
\ No newline at end of file
+API_BATCH_SIZE = 20  # Number of books to check in one API call
+DOWNLOAD_BATCH_SIZE = 20  # Number of books to download in one audible CLI invocation
+DB_COMMIT_BATCH_SIZE = 16  # Number of converted books marked downloaded per transaction
+DB_UPDATE_BATCH_SIZE = 500  # Number of restriction results written per transaction
+LIBRARY_INSERT_BATCH_SIZE = 500  # Number of library books inserted per transaction
+
+# Concurrency settings
+DOWNLOAD_WORKERS = int(os.getenv('AUDIBLE_WORKERS', '4'))  # Parallel audible downloads
+CONVERSION_WORKERS = int(os.getenv('CONVERSION_WORKERS', str(min(os.cpu_count() or 1, 4))))  # Parallel ffmpeg conversions
+API_WORKERS = 4  # Parallel audible API batch queries
\ No newline at end of file
@@ -4,10 +4,46 @@ Handles all SQLite database interactions and schema management.
 """
 
 import sqlite3
-import sys
-from typing import List, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Set, Tuple
 from config import DATABASE_PATH
 
+# Connection tuning: WAL with NORMAL sync avoids a full fsync on every commit.
+# WAL needs shared memory, so the database must live on a local filesystem, not a network share.
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+    "busy_timeout=5000",
+)
+SQLITE_CACHED_STATEMENTS = 256  # Keep every prepared statement below, with room to spare
+
+# Shared statement text, so repeated calls hit the connection's statement cache
+_BOOK_COLUMNS = """(asin, title, subtitle, authors, series_title, narrators, series_sequence, release_date,
+                downloaded, is_downloadable, restriction_reason, last_download_attempt)"""
+_SQL_INSERT_NEW_BOOK = f"INSERT OR IGNORE INTO audiobooks {_BOOK_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 1, NULL, NULL)"
+_SQL_SELECT_ASINS = "SELECT asin FROM audiobooks"
+_SQL_SELECT_UNCHECKED = """
+    SELECT asin, title FROM audiobooks
+    WHERE is_downloadable = 1 AND restriction_reason IS NULL AND downloaded = 0
+    ORDER BY asin
+"""
+_SQL_SELECT_DOWNLOADABLE = """
+    SELECT asin, title, restriction_reason FROM audiobooks
+    WHERE downloaded = 0 AND is_downloadable = 1
+"""
+_SQL_SELECT_RESTRICTED = """
+    SELECT asin, title, restriction_reason FROM audiobooks
+    WHERE downloaded = 0 AND is_downloadable = 0
+"""
+_SQL_UPDATE_DOWNLOADABILITY = "UPDATE audiobooks SET is_downloadable = ?, restriction_reason = ? WHERE asin = ?"
+_SQL_UPDATE_DOWNLOAD_ATTEMPT = "UPDATE audiobooks SET last_download_attempt = ? WHERE asin = ?"
+_SQL_MARK_DOWNLOADED = "UPDATE audiobooks SET downloaded = 1 WHERE asin = ?"
+_SQL_SELECT_TITLE = "SELECT title FROM audiobooks WHERE asin = ?"
+
 
 class AudiobookDatabase:
     """Manages the audiobook database operations."""
@@ -15,14 +51,33 @@ class AudiobookDatabase:
     def __init__(self, db_path: str = DATABASE_PATH):
         self.db_path = db_path
         self.connection = None
+        self._lock = threading.Lock()
         self._init_database()
     
     def _init_database(self):
         """Initialize database connection and create tables."""
-        self.connection = sqlite3.connect(self.db_path)
-        with self.connection:
+        # The connection is shared by download worker threads; all access goes through self._lock.
+        # Autocommit mode: single statements commit on their own, batches use _transaction().
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                          cached_statements=SQLITE_CACHED_STATEMENTS)
+        for pragma in SQLITE_PRAGMAS:
+            self.connection.execute(f"PRAGMA {pragma}")
+        with self._transaction():
             self._create_tables()
             self._migrate_schema()
+            self._create_indexes()
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one explicit transaction, committing once."""
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
     
     def _create_tables(self):
         """Create the audiobooks table if it doesn't exist."""
@@ -51,101 +106,122 @@ class AudiobookDatabase:
             ("last_download_attempt", "TEXT")
         ]
         
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(audiobooks)")}
         for column_name, column_def in migrations:
-            try:
+            if column_name not in existing:
                 self.connection.execute(f"ALTER TABLE audiobooks ADD COLUMN {column_name} {column_def}")
-            except sqlite3.OperationalError:
-                pass  # Column already exists
+    
+    def _create_indexes(self):
+        """Create indexes for the per-cycle status queries."""
+        existing = {row[0] for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'audiobooks'")}
+        
+        # The UNIQUE constraint already indexes asin. The composite index serves both the
+        # downloadable/restricted queries and the integrity check's downloaded = 1 scan.
+        self.connection.execute("""
+            CREATE INDEX IF NOT EXISTS idx_audiobooks_download_status
+            ON audiobooks(downloaded, is_downloadable)
+        """)
+        # Books still waiting for a restriction check, already in ASIN order
+        self.connection.execute("""
+            CREATE INDEX IF NOT EXISTS idx_audiobooks_unchecked
+            ON audiobooks(asin)
+            WHERE is_downloadable = 1 AND restriction_reason IS NULL AND downloaded = 0
+        """)
+        
+        # Gather statistics once so the planner picks the new indexes
+        if not {"idx_audiobooks_download_status", "idx_audiobooks_unchecked"} <= existing:
+            self.connection.execute("ANALYZE audiobooks")
+    
+    def _book_values(self, book_data: dict) -> Tuple:
+        """Build the metadata values for a new book; status columns use SQL literals."""
+        return (
+            book_data.get('asin', ''),
+            book_data.get('title', ''),
+            book_data.get('subtitle', ''),
+            book_data.get('authors', ''),
+            book_data.get('series_title', ''),
+            book_data.get('narrators', ''),
+            book_data.get('series_sequence', None),
+            book_data.get('release_date', '')
+        )
     
     def add_book(self, book_data: dict) -> bool:
         """Add a new book to the database if it doesn't exist."""
         try:
-            values = [
-                book_data.get('asin', ''),
-                book_data.get('title', ''),
-                book_data.get('subtitle', ''),
-                book_data.get('authors', ''),
-                book_data.get('series_title', ''),
-                book_data.get('narrators', ''),
-                book_data.get('series_sequence', None),
-                book_data.get('release_date', ''),
-                0,  # downloaded
-                1,  # is_downloadable (default)
-                None,  # restriction_reason
-                None   # last_download_attempt
-            ]
-            
-            cursor = self.connection.cursor()
-            existing = cursor.execute('SELECT * FROM audiobooks WHERE asin=?', [book_data.get('asin', '')]).fetchone()
-            
-            if existing is None:
-                cursor.execute('INSERT INTO audiobooks VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', values)
-                self.connection.commit()
-                return True
-            return False
+            # Same single INSERT OR IGNORE as the bulk path, instead of a SELECT first
+            return self.add_books([book_data]) == 1
         except Exception as e:
             print(f"Error adding book to database: {e}")
-            sys.stdout.flush()
             return False
     
+    def add_books(self, books: Iterable[dict]) -> int:
+        """Insert several new books in a single transaction and return the number added."""
+        rows = [self._book_values(book_data) for book_data in books]
+        if not rows:
+            return 0
+        
+        with self._transaction() as connection:
+            # The UNIQUE constraint on asin drops duplicates without a prior SELECT
+            cursor = connection.executemany(_SQL_INSERT_NEW_BOOK, rows)
+            return cursor.rowcount
+    
+    def get_existing_asins(self) -> Set[str]:
+        """Get the set of all ASINs already in the database."""
+        with self._lock:
+            return {row[0] for row in self.connection.execute(_SQL_SELECT_ASINS)}
+    
     def get_unchecked_books(self) -> List[Tuple[str, str]]:
         """Get books that haven't been checked for downloadability."""
-        cursor = self.connection.cursor()
-        return cursor.execute('''
-            SELECT asin, title FROM audiobooks 
-            WHERE is_downloadable = 1 AND restriction_reason IS NULL 
-            AND downloaded = 0
-            ORDER BY asin
-        ''').fetchall()
+        with self._lock:
+            return self.connection.execute(_SQL_SELECT_UNCHECKED).fetchall()
     
     def get_downloadable_books(self) -> List[Tuple[str, str, str]]:
         """Get books that are downloadable and not yet downloaded."""
-        cursor = self.connection.cursor()
-        return cursor.execute('''
-            SELECT asin, title, restriction_reason 
-            FROM audiobooks 
-            WHERE downloaded = 0 AND is_downloadable = 1
-        ''').fetchall()
+        with self._lock:
+            return self.connection.execute(_SQL_SELECT_DOWNLOADABLE).fetchall()
     
     def get_restricted_books(self) -> List[Tuple[str, str, str]]:
         """Get books that are restricted from downloading."""
-        cursor = self.connection.cursor()
-        return cursor.execute('''
-            SELECT asin, title, restriction_reason 
-            FROM audiobooks 
-            WHERE downloaded = 0 AND is_downloadable = 0
-        ''').fetchall()
+        with self._lock:
+            return self.connection.execute(_SQL_SELECT_RESTRICTED).fetchall()
     
     def update_downloadability(self, asin: str, is_downloadable: bool, reason: Optional[str] = None):
         """Update the downloadability status of a book."""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            UPDATE audiobooks 
-            SET is_downloadable = ?, restriction_reason = ?
-            WHERE asin = ?
-        ''', (1 if is_downloadable else 0, reason, asin))
-        self.connection.commit()
+        with self._lock:
+            self.connection.execute(_SQL_UPDATE_DOWNLOADABILITY, (1 if is_downloadable else 0, reason, asin))
+    
+    def update_downloadability_many(self, updates: Iterable[Tuple[bool, Optional[str], str]]):
+        """Update downloadability from (is_downloadable, reason, asin) tuples in one transaction."""
+        with self._transaction() as connection:
+            connection.executemany(_SQL_UPDATE_DOWNLOADABILITY,
+                                   [(1 if is_downloadable else 0, reason, asin)
+                                    for is_downloadable, reason, asin in updates])
     
     def update_download_attempt(self, asin: str, timestamp: str):
         """Update the last download attempt timestamp."""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            UPDATE audiobooks 
-            SET last_download_attempt = ? 
-            WHERE asin = ?
-        ''', (timestamp, asin))
-        self.connection.commit()
+        with self._lock:
+            self.connection.execute(_SQL_UPDATE_DOWNLOAD_ATTEMPT, (timestamp, asin))
+    
+    def update_download_attempts(self, asins: Iterable[str], timestamp: str):
+        """Record the same download attempt timestamp for several books in one transaction."""
+        with self._transaction() as connection:
+            connection.executemany(_SQL_UPDATE_DOWNLOAD_ATTEMPT, [(timestamp, asin) for asin in asins])
     
     def mark_downloaded(self, asin: str):
         """Mark a book as successfully downloaded."""
-        cursor = self.connection.cursor()
-        cursor.execute('UPDATE audiobooks SET downloaded = 1 WHERE asin = ?', (asin,))
-        self.connection.commit()
+        with self._lock:
+            self.connection.execute(_SQL_MARK_DOWNLOADED, (asin,))
+    
+    def mark_downloaded_many(self, asins: Iterable[str]):
+        """Mark several books as downloaded in a single transaction."""
+        with self._transaction() as connection:
+            connection.executemany(_SQL_MARK_DOWNLOADED, [(asin,) for asin in asins])
     
     def get_book_info(self, asin: str) -> Optional[Tuple]:
         """Get book information by ASIN."""
-        cursor = self.connection.cursor()
-        return cursor.execute('SELECT title FROM audiobooks WHERE asin=?', (asin,)).fetchone()
+        with self._lock:
+            return self.connection.execute(_SQL_SELECT_TITLE, (asin,)).fetchone()
     
     def close(self):
         """Close the database connection."""
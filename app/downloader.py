@@ -3,12 +3,14 @@ Core download logic module.
 Handles the main download workflow and coordination.
 """
 
-import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Tuple
+from config import DOWNLOAD_BATCH_SIZE, DOWNLOAD_WORKERS
 from database import db
 from audible_api import audible_api
 from restriction_checker import restriction_checker
+from file_processor import file_processor
 
 
 class AudiobookDownloader:
@@ -28,59 +30,80 @@ class AudiobookDownloader:
             # Check if there are downloadable books
             if not downloadable_books:
                 print("No downloadable books found that haven't been downloaded yet.")
-                sys.stdout.flush()
                 return
             
             print(f"Found {len(downloadable_books)} downloadable books to process.")
-            sys.stdout.flush()
             
-            # Process each downloadable book
-            for asin, title, _ in downloadable_books:
-                self._download_single_book(asin, title)
+            # Download batches in parallel; the work is network-bound. Each finished batch is
+            # converted right away while the remaining batches keep downloading.
+            batches = [downloadable_books[i:i+DOWNLOAD_BATCH_SIZE]
+                       for i in range(0, len(downloadable_books), DOWNLOAD_BATCH_SIZE)]
+            failed_count = 0
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+                futures = [executor.submit(self._download_batch, batch) for batch in batches]
+                
+                for future in as_completed(futures):
+                    downloaded = []
+                    for asin, title, success in future.result():
+                        if success:
+                            downloaded.append(asin)
+                        else:
+                            failed_count += 1
+                    
+                    if downloaded:
+                        file_processor.process_downloaded_files(downloaded)
+            
+            if failed_count:
+                print(f"{failed_count} of {len(downloadable_books)} downloads failed.")
                 
         except Exception as e:
             print(f"Error in download_new_titles: {e}")
-            sys.stdout.flush()
     
     def _report_restricted_books(self, restricted_books: List[Tuple[str, str, str]]):
         """Report books that are being skipped due to restrictions."""
         print(f"\n📋 Skipping {len(restricted_books)} non-downloadable books:")
-        sys.stdout.flush()
         
         for asin, title, reason in restricted_books:
             print(f"   ⚠️  {title} (ASIN: {asin}) - {reason or 'Unknown restriction'}")
-            sys.stdout.flush()
         print()
     
-    def _download_single_book(self, asin: str, title: str):
-        """Download a single audiobook and handle errors."""
+    def _download_batch(self, batch: List[Tuple[str, str, str]]) -> List[Tuple[str, str, bool]]:
+        """Download a batch of audiobooks with one CLI call, falling back to single downloads on failure."""
+        # Record the attempt for the whole batch in a single transaction
+        db.update_download_attempts([asin for asin, _, _ in batch], datetime.now().isoformat())
+        
+        if len(batch) == 1:
+            asin, title, _ = batch[0]
+            return [self._download_single_book(asin, title)]
+        
+        if audible_api.download_books([asin for asin, _, _ in batch]):
+            return [(asin, title, True) for asin, title, _ in batch]
+        
+        # Retry individually to find the failing books; already downloaded files are skipped by the CLI
+        print(f"Batch download failed, retrying {len(batch)} books individually...")
+        return [self._download_single_book(asin, title) for asin, title, _ in batch]
+    
+    def _download_single_book(self, asin: str, title: str) -> Tuple[str, str, bool]:
+        """Download a single audiobook and return an (asin, title, success) status tuple."""
         try:
-            # Update last download attempt timestamp
-            timestamp = datetime.now().isoformat()
-            db.update_download_attempt(asin, timestamp)
-            
-            # Attempt download
-            success = audible_api.download_book(asin)
+            # Attempt download; the caller has already recorded the attempt
+            success, restriction_reason = audible_api.download_book(asin)
             
             if not success:
-                print(f"Download failed for ASIN {asin} (exit code: non-zero)")
-                sys.stdout.flush()
+                print(f"Download failed for ASIN {asin}")
                 
-                # Check if it's actually not downloadable
-                error_reason = audible_api.check_download_error(asin)
-                if error_reason:
+                # The download output already tells us if it's actually not downloadable
+                if restriction_reason:
                     print(f"   Detected download restriction for {title} - updating database")
-                    db.update_downloadability(asin, False, error_reason)
-                    sys.stdout.flush()
+                    db.update_downloadability(asin, False, restriction_reason)
                 
-                return False
+                return asin, title, False
             
-            return True
+            return asin, title, True
             
         except Exception as e:
             print(f"Error downloading {asin}: {e}")
-            sys.stdout.flush()
-            return False
+            return asin, title, False
 
 
 # Global downloader instance
@@ -3,79 +3,151 @@ File processing module.
 Handles audiobook file conversion, organization, and cleanup.
 """
 
+import collections
+import functools
+import json
 import os
 import shutil
 import subprocess
-import sys
-from typing import Optional, List
-from config import AUDIOBOOK_DOWNLOAD_DIR, AUDIOBOOK_DIR, USE_FOLDERS
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Optional, List, Set, Tuple
+from config import FFMPEG_BIN, AUDIOBOOK_DOWNLOAD_DIR, AUDIOBOOK_DIR, USE_FOLDERS, CONVERSION_WORKERS, DB_COMMIT_BATCH_SIZE
 from database import db
 
+# orjson is optional; fall back to the standard library parser
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+# Lines of ffmpeg output kept for the error message of a failed conversion
+FFMPEG_LOG_TAIL_LINES = 50
+
+# Fixed parts of the ffmpeg command; decryption args, input and output are filled in per file
+_FFMPEG_PREFIX = (
+    FFMPEG_BIN, "-y",
+    "-loglevel", "error",  # Only errors; a successful remux has nothing worth logging
+)
+_FFMPEG_OUTPUT_ARGS = (
+    "-c", "copy",
+    "-threads", "1",  # Parallelism is per file; avoid oversubscribing cores
+    "-f", "ipod",  # The .m4b muxer, since the .tmp suffix hides the format
+)
+
 
 class FileProcessor:
     """Manages audiobook file processing and organization."""
     
-    def process_downloaded_files(self):
-        """Process all downloaded audiobook files."""
+    @functools.cached_property
+    def _activation_args(self) -> Tuple[str, str]:
+        """FFmpeg decryption args for AAX files, built once from the account's activation bytes."""
+        # Imported lazily so loading this module doesn't fetch activation bytes
+        from audible_api import audible_api
+        return ("-activation_bytes", audible_api.activation_bytes)
+    
+    def process_downloaded_files(self, asins: Optional[Iterable[str]] = None):
+        """Process downloaded audiobook files, or only those of the given ASINs."""
         try:
-            audiobooks = self._get_downloaded_files()
+            audiobooks, voucher_entries = self._scan_download_dir()
+            if asins is not None:
+                wanted = set(asins)
+                audiobooks = [f for f in audiobooks if f.partition("_")[0] in wanted]
+                voucher_entries = [e for e in voucher_entries if e.name.partition("_")[0] in wanted]
             if not audiobooks:
                 return
             
-            for audiobook in audiobooks:
-                self._process_single_file(audiobook)
+            # Parse every voucher and load the known ASINs once up front instead of per audiobook
+            vouchers = self._load_vouchers(voucher_entries)
+            known_asins = db.get_existing_asins()
+            
+            # Each ffmpeg run is independent, so convert several files at once
+            converted = []
+            with ThreadPoolExecutor(max_workers=CONVERSION_WORKERS) as executor:
+                futures = [executor.submit(self._process_single_file, audiobook, vouchers, known_asins)
+                           for audiobook in audiobooks]
+                
+                for future in as_completed(futures):
+                    asin = future.result()
+                    if asin:
+                        converted.append(asin)
+                    
+                    # Mark finished books in batches to coalesce commits
+                    if len(converted) >= DB_COMMIT_BATCH_SIZE:
+                        db.mark_downloaded_many(converted)
+                        converted = []
+            
+            if converted:
+                db.mark_downloaded_many(converted)
                 
         except OSError as e:
             print(f"Error accessing download directory: {e}")
-            sys.stdout.flush()
     
-    def _get_downloaded_files(self) -> List[str]:
-        """Get list of downloaded audiobook files."""
-        try:
-            return [f for f in os.listdir(AUDIOBOOK_DOWNLOAD_DIR) 
-                   if f.endswith(('.aax', '.aaxc'))]
-        except OSError:
-            return []
+    def _scan_download_dir(self) -> Tuple[List[str], List[os.DirEntry]]:
+        """List downloaded audiobook file names and voucher entries in a single directory pass."""
+        audiobooks = []
+        vouchers = []
+        with os.scandir(AUDIOBOOK_DOWNLOAD_DIR) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(('.aax', '.aaxc')):
+                    audiobooks.append(entry.name)
+                elif entry.name.endswith('.voucher'):
+                    vouchers.append(entry)
+        return audiobooks, vouchers
     
-    def _process_single_file(self, audiobook_file: str):
-        """Process a single audiobook file."""
+    def _load_vouchers(self, voucher_entries: List[os.DirEntry]) -> Dict[str, Tuple[str, str]]:
+        """Map each ASIN to the AAXC key and IV from its voucher file."""
+        vouchers = {}
+        for entry in voucher_entries:
+            voucher_file = entry.name
+            try:
+                with open(entry.path, 'rb') as f:
+                    license_response = _json.loads(f.read())['content_license']['license_response']
+                
+                asin = voucher_file.partition("_")[0]
+                vouchers[asin] = (license_response['key'], license_response['iv'])
+                
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Error reading voucher {voucher_file}: {e}")
+        
+        return vouchers
+    
+    def _process_single_file(self, audiobook_file: str, vouchers: Dict[str, Tuple[str, str]],
+                             known_asins: Set[str]) -> Optional[str]:
+        """Process a single audiobook file and return its ASIN if it was converted."""
         try:
             print(f"Processing file: {audiobook_file}")
-            sys.stdout.flush()
             
             # Extract ASIN from filename
-            asin = audiobook_file.split("_")[0]
+            asin = audiobook_file.partition("_")[0]
             
             # Validate ASIN exists in database
-            if not self._validate_asin(asin, audiobook_file):
-                return
-            
-            # Update database to mark as downloaded
-            db.mark_downloaded(asin)
+            if not self._validate_asin(asin, audiobook_file, known_asins):
+                return None
             
-            # Process the audio file
-            self._convert_and_organize(audiobook_file, asin)
+            # Process the audio file; the caller marks it downloaded on success
+            if self._convert_and_organize(audiobook_file, asin, vouchers.get(asin)):
+                return asin
+            return None
             
         except Exception as e:
             print(f"Error processing {audiobook_file}: {e}")
-            sys.stdout.flush()
+            return None
     
-    def _validate_asin(self, asin: str, audiobook_file: str) -> bool:
+    def _validate_asin(self, asin: str, audiobook_file: str, known_asins: Set[str]) -> bool:
         """Validate that the ASIN exists in our database."""
-        book_info = db.get_book_info(asin)
-        
-        if book_info is None:
+        if asin not in known_asins:
             # Try to find the original ASIN from the download request
             original_asin = self._find_original_asin(audiobook_file)
-            if original_asin and db.get_book_info(original_asin):
+            if original_asin and original_asin in known_asins:
                 # Rename file to match database ASIN
-                new_name = audiobook_file.replace(asin, original_asin)
+                new_name = original_asin + audiobook_file[len(asin):]
                 try:
                     old_path = os.path.join(AUDIOBOOK_DOWNLOAD_DIR, audiobook_file)
                     new_path = os.path.join(AUDIOBOOK_DOWNLOAD_DIR, new_name)
                     shutil.move(old_path, new_path)
                     print(f"Renamed file to match database ASIN: {new_name}")
-                    sys.stdout.flush()
                     return True
                 except OSError as e:
                     print(f"Error renaming file {audiobook_file}: {e}")
@@ -92,8 +164,8 @@ class FileProcessor:
         # logic to track the original ASIN from the download request
         return None
     
-    def _convert_and_organize(self, audiobook_file: str, asin: str):
-        """Convert and organize the audiobook file."""
+    def _convert_and_organize(self, audiobook_file: str, asin: str, voucher: Optional[Tuple[str, str]] = None) -> bool:
+        """Convert and organize the audiobook file, returning True on success."""
         try:
             src_path = os.path.join(AUDIOBOOK_DOWNLOAD_DIR, audiobook_file)
             
@@ -110,37 +182,23 @@ class FileProcessor:
                 dest_folder = self._create_audiobook_folder(asin)
                 if not dest_folder:
                     print(f"Skipping {base_name} - could not create folder structure")
-                    return
+                    return False
                 dest_path = os.path.join(dest_folder, base_name + ".m4b")
             else:
                 dest_path = os.path.join(AUDIOBOOK_DIR, base_name + ".m4b")
             
             print(f"Converting {src_path} -> {dest_path}")
-            sys.stdout.flush()
-            
-            # Remove existing file if it exists
-            if os.path.exists(dest_path):
-                print(f"Removing existing file: {os.path.basename(dest_path)}")
-                try:
-                    os.remove(dest_path)
-                except OSError as e:
-                    print(f"Error removing existing file: {e}")
-                    return
             
-            # Convert the file
-            self._convert_audiobook(src_path, dest_path)
+            # Convert the file; an existing destination is replaced atomically on success
+            return self._convert_audiobook(src_path, dest_path, voucher)
             
         except Exception as e:
             print(f"Error converting and organizing {audiobook_file}: {e}")
-            sys.stdout.flush()
+            return False
     
     def _create_audiobook_folder(self, asin: str) -> Optional[str]:
         """Create the appropriate folder structure for an audiobook."""
         try:
-            book_info = db.get_book_info(asin)
-            if not book_info:
-                return None
-            
             # This is a simplified version - you might want to implement
             # more sophisticated folder creation logic based on metadata
             folder_path = os.path.join(AUDIOBOOK_DIR, asin)
@@ -151,54 +209,80 @@ class FileProcessor:
             print(f"Error creating folder for {asin}: {e}")
             return None
     
-    def _convert_audiobook(self, src_path: str, dest_path: str):
-        """Convert audiobook using FFmpeg."""
+    def _convert_audiobook(self, src_path: str, dest_path: str, voucher: Optional[Tuple[str, str]] = None) -> bool:
+        """Convert audiobook using FFmpeg, returning True on success."""
         try:
             print(f"Converting audiobook: {os.path.basename(src_path)}")
-            sys.stdout.flush()
             
-            # Get activation bytes from the API
-            from audible_api import audible_api
-            activation_bytes = audible_api.activation_bytes
+            if src_path.endswith('.aaxc'):
+                # AAXC files are decrypted with the per-book key and IV from their voucher
+                if not voucher:
+                    print(f"No voucher found for {os.path.basename(src_path)} - skipping conversion")
+                    return False
+                key, iv = voucher
+                decrypt_args = ("-audible_key", key, "-audible_iv", iv)
+            else:
+                decrypt_args = self._activation_args
+            
+            # Write to a temporary file so an interrupted conversion never leaves a partial .m4b
+            tmp_path = dest_path + ".tmp"
             
             # FFmpeg conversion command
-            cmd = [
-                "ffmpeg", "-y", 
-                "-activation_bytes", activation_bytes,
-                "-i", src_path,
-                "-c", "copy",
-                dest_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"Successfully converted: {os.path.basename(dest_path)}")
-                # Remove source file after successful conversion
-                os.remove(src_path)
-                print(f"Removed source file: {os.path.basename(src_path)}")
-            else:
-                print(f"Error converting {os.path.basename(src_path)}: {result.stderr}")
+            cmd = [*_FFMPEG_PREFIX, *decrypt_args, "-i", src_path, *_FFMPEG_OUTPUT_ARGS, tmp_path]
             
-            sys.stdout.flush()
+            # Keep only the tail of ffmpeg's stderr for error reporting instead of buffering all of it
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True, errors='replace')
+            converted = False
+            try:
+                with process.stderr:
+                    stderr_tail = collections.deque(process.stderr, maxlen=FFMPEG_LOG_TAIL_LINES)
+                if process.wait() == 0:
+                    os.replace(tmp_path, dest_path)
+                    converted = True
+                else:
+                    print(f"Error converting {os.path.basename(src_path)}: {''.join(stderr_tail)}")
+            finally:
+                # Always reap ffmpeg and never leave a partial .tmp behind, even if reading failed
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+                if not converted:
+                    try:
+                        os.remove(tmp_path)
+                    except FileNotFoundError:
+                        pass
+            
+            if not converted:
+                return False
+            
+            print(f"Successfully converted: {os.path.basename(dest_path)}")
+            # Remove source file after successful conversion
+            os.remove(src_path)
+            print(f"Removed source file: {os.path.basename(src_path)}")
+            if src_path.endswith('.aaxc'):
+                # The voucher is only needed for this conversion; cleanup_temp_files is a fallback
+                try:
+                    os.remove(os.path.splitext(src_path)[0] + ".voucher")
+                except FileNotFoundError:
+                    pass
+            return True
             
         except Exception as e:
             print(f"Error in FFmpeg conversion: {e}")
-            sys.stdout.flush()
+            return False
     
     def cleanup_temp_files(self):
         """Clean up temporary files and vouchers."""
         try:
-            vouchers = [f for f in os.listdir(AUDIOBOOK_DOWNLOAD_DIR) 
-                       if f.endswith('.voucher')]
+            _, vouchers = self._scan_download_dir()
             
             for voucher in vouchers:
                 try:
-                    voucher_path = os.path.join(AUDIOBOOK_DOWNLOAD_DIR, voucher)
-                    os.remove(voucher_path)
-                    print(f"Cleaned up remaining voucher: {voucher}")
+                    os.remove(voucher.path)
+                    print(f"Cleaned up remaining voucher: {voucher.name}")
                 except OSError as e:
-                    print(f"Error removing voucher {voucher}: {e}")
+                    print(f"Error removing voucher {voucher.name}: {e}")
                     
         except OSError as e:
             print(f"Error accessing download directory for cleanup: {e}")
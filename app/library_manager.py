@@ -3,7 +3,8 @@ Library management module.
 Handles updating and synchronizing the audiobook library.
 """
 
-import sys
+import itertools
+from config import LIBRARY_INSERT_BATCH_SIZE
 from database import db
 from audible_api import audible_api
 
@@ -17,38 +18,51 @@ class LibraryManager:
             # Update library from Audible
             if not audible_api.update_library():
                 print("Failed to update library from Audible")
-                sys.stdout.flush()
                 return
             
-            # Read and process library data
-            books_data = audible_api.get_library_data()
-            if not books_data:
-                print("No library data found")
-                sys.stdout.flush()
-                return
-            
-            # Add new books to database
+            # Stream library data into the database in chunks, one transaction each
+            existing_asins = db.get_existing_asins()
+            books = audible_api.iter_library_data()
+            seen_count = 0
             added_count = 0
-            for book_data in books_data:
+            while True:
+                chunk = list(itertools.islice(books, LIBRARY_INSERT_BATCH_SIZE))
+                if not chunk:
+                    break
+                seen_count += len(chunk)
+                
+                # Find books not yet in the database with a single ASIN lookup
+                new_books = []
+                for book_data in chunk:
+                    asin = book_data.get('asin', '')
+                    if asin in existing_asins:
+                        continue
+                    existing_asins.add(asin)
+                    new_books.append(book_data)
+                
+                # Add new books to database
                 try:
-                    if db.add_book(book_data):
-                        title = book_data.get('title', 'Unknown')
-                        asin = book_data.get('asin', 'Unknown')
-                        print(f"Added new book to database: {title} (ASIN: {asin})")
-                        sys.stdout.flush()
-                        added_count += 1
-                        
+                    added_count += db.add_books(new_books)
+                    added_books = new_books
                 except Exception as e:
-                    print(f"Error processing book: {e}")
-                    sys.stdout.flush()
-                    continue
+                    print(f"Error adding books to database: {e}")
+                    # Retry this chunk one book at a time so a bad row only skips itself
+                    added_books = [book_data for book_data in new_books if db.add_book(book_data)]
+                    added_count += len(added_books)
+                
+                for book_data in added_books:
+                    title = book_data.get('title', 'Unknown')
+                    asin = book_data.get('asin', 'Unknown')
+                    print(f"Added new book to database: {title} (ASIN: {asin})")
+            
+            if not seen_count:
+                print("No library data found")
+                return
             
             print(f"Library update complete. Added {added_count} new books.")
-            sys.stdout.flush()
             
         except Exception as e:
             print(f"Error in update_library: {e}")
-            sys.stdout.flush()
 
 
 # Global library manager instance
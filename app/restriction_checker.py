@@ -3,12 +3,15 @@ Download restriction checker module.
 Handles detection of Audible Plus and other download restrictions.
 """
 
-import sys
-from typing import List, Tuple
-from config import API_BATCH_SIZE
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+from config import API_BATCH_SIZE, API_WORKERS, DB_UPDATE_BATCH_SIZE
 from database import db
 from audible_api import audible_api
 
+# (is_downloadable, restriction_reason, asin), the row order used by db.update_downloadability_many
+StatusUpdate = Tuple[bool, Optional[str], str]
+
 
 class RestrictionChecker:
     """Handles checking and updating download restrictions for audiobooks."""
@@ -17,71 +20,67 @@ class RestrictionChecker:
         """Check and update downloadability status for unchecked books."""
         try:
             print("🔍 Checking download restrictions for new books...")
-            sys.stdout.flush()
             
             unchecked_books = db.get_unchecked_books()
             
             if not unchecked_books:
                 print("   All books already checked for download restrictions")
-                sys.stdout.flush()
                 return
             
             print(f"   Checking {len(unchecked_books)} books for download restrictions...")
-            sys.stdout.flush()
             
-            # Process books in batches
-            for i in range(0, len(unchecked_books), API_BATCH_SIZE):
-                batch = unchecked_books[i:i+API_BATCH_SIZE]
-                self._process_batch(batch)
+            # Process books in batches; each batch waits on a network round trip, so run several at once
+            batches = [unchecked_books[i:i+API_BATCH_SIZE]
+                       for i in range(0, len(unchecked_books), API_BATCH_SIZE)]
+            # Workers only query the API; their status updates are written here in bulk
+            updates = []
+            with ThreadPoolExecutor(max_workers=API_WORKERS) as executor:
+                futures = [executor.submit(self._process_batch, batch) for batch in batches]
+                
+                for future in as_completed(futures):
+                    updates.extend(future.result())
+                    
+                    if len(updates) >= DB_UPDATE_BATCH_SIZE:
+                        db.update_downloadability_many(updates)
+                        updates = []
+            
+            if updates:
+                db.update_downloadability_many(updates)
                 
         except Exception as e:
             print(f"Error in check_all_restrictions: {e}")
-            sys.stdout.flush()
     
-    def _process_batch(self, batch: List[Tuple[str, str]]):
-        """Process a batch of books for restriction checking."""
-        asins = [book[0] for book in batch]
+    def _process_batch(self, batch: List[Tuple[str, str]]) -> List[StatusUpdate]:
+        """Check a batch of books and return their status updates."""
+        asins = tuple(book[0] for book in batch)
         
-        # Try batch API call first
         api_data = audible_api.get_book_details(asins)
         
         if api_data and api_data.get('items'):
             # Batch call succeeded
-            self._process_batch_response(api_data['items'])
-        else:
-            # Batch failed, try individual calls
-            print(f"   Batch API call failed, checking individual ASINs...")
-            sys.stdout.flush()
-            self._process_individual_books(batch)
+            return self._process_batch_response(api_data['items'])
+        
+        if len(batch) == 1:
+            asin, title = batch[0]
+            print(f"   ❓ {title} (ASIN: {asin}) - No API data available")
+            return [(False, "No API data available (may be invalid ASIN)", asin)]
+        
+        # Halve the failed batch so one bad ASIN costs a few extra calls rather than one per book
+        print(f"   Batch API call failed, retrying {len(batch)} books in smaller batches...")
+        middle = len(batch) // 2
+        return self._process_batch(batch[:middle]) + self._process_batch(batch[middle:])
     
-    def _process_batch_response(self, items: List[dict]):
+    def _process_batch_response(self, items: List[dict]) -> List[StatusUpdate]:
         """Process successful batch API response."""
+        updates = []
         for item in items:
             asin = item.get('asin')
             title = item.get('title', 'Unknown')
             is_downloadable, reason = self._analyze_book_restrictions(item)
             
-            self._update_book_status(asin, title, is_downloadable, reason)
-    
-    def _process_individual_books(self, batch: List[Tuple[str, str]]):
-        """Process books individually when batch calls fail."""
-        for asin, title in batch:
-            try:
-                book_data = audible_api.get_single_book_details(asin)
-                
-                if book_data:
-                    is_downloadable, reason = self._analyze_book_restrictions(book_data)
-                    self._update_book_status(asin, title, is_downloadable, reason)
-                else:
-                    # No API data available
-                    print(f"   ❓ {title} (ASIN: {asin}) - No API data available")
-                    db.update_downloadability(asin, False, "No API data available (may be invalid ASIN)")
-                    
-            except Exception as e:
-                print(f"   ❌ {title} (ASIN: {asin}) - Error: {e}")
-                db.update_downloadability(asin, False, f"Error during check: {e}")
-                
-            sys.stdout.flush()
+            updates.append(self._book_status(asin, title, is_downloadable, reason))
+        
+        return updates
     
     def _analyze_book_restrictions(self, book_data: dict) -> Tuple[bool, str]:
         """Analyze book data to determine if it has download restrictions."""
@@ -102,16 +101,14 @@ class RestrictionChecker:
         # Book appears to be downloadable
         return True, None
     
-    def _update_book_status(self, asin: str, title: str, is_downloadable: bool, reason: str):
-        """Update book status in database and log the result."""
-        db.update_downloadability(asin, is_downloadable, reason)
-        
+    def _book_status(self, asin: str, title: str, is_downloadable: bool, reason: str) -> StatusUpdate:
+        """Log the result for a book and return its status update."""
         if is_downloadable:
             print(f"   ✅ {title} (ASIN: {asin}) - Downloadable")
         else:
             print(f"   ⚠️  {title} (ASIN: {asin}) - {reason}")
         
-        sys.stdout.flush()
+        return is_downloadable, reason, asin
 
 
 # Global restriction checker instance
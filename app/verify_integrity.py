@@ -12,27 +12,72 @@ This script verifies the integrity of all audiobook files in the database by:
 
 import json
 import os
+import re
 import sqlite3
 import subprocess
 import sys
 from pathlib import Path
 import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# orjson is optional; it parses ffprobe output faster and takes bytes directly
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+# mutagen is optional; it reads MP4 header atoms in-process instead of running ffprobe
+try:
+    from mutagen.mp4 import MP4
+except ImportError:
+    MP4 = None
 
 # Configuration - matches main script
 config = "/config"
 audiobook_directory = "/audiobooks"
 use_folders = True if os.getenv('AUDIOBOOK_FOLDERS') == "True" else False
 
+# Connection tuning - matches database.py so fixes keep the WAL journal
+sqlite_pragmas = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+    "busy_timeout=5000",
+)
+_LOOKUP_BATCH_SIZE = 500  # ASINs per IN (...) lookup, well under SQLite's parameter limit
+
+# ffprobe runs as a subprocess, so threads verify files in parallel without contending for the GIL
+default_jobs = min(32, (os.cpu_count() or 1) * 2)
+
+# Audiobook file extensions, as a tuple so str.endswith checks them all in one call
+_AUDIO_EXTS = ('.m4b', '.aax', '.aaxc')
+
+def open_db():
+    """Open the audiobook database in autocommit mode with the shared pragmas.
+    
+    Writes use explicit transactions. Everything runs on the main thread,
+    so one connection serves the whole run.
+    """
+    con = sqlite3.connect(config + "/audiobooks.db", isolation_level=None)
+    for pragma in sqlite_pragmas:
+        con.execute(f"PRAGMA {pragma}")
+    return con
+
+# Characters not allowed in folder names; one regex pass measured faster than str.translate here
+_INVALID_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+@functools.lru_cache(maxsize=4096)
+def sanitize_name(name):
+    """Replace characters that are invalid in folder names."""
+    if name is None:
+        return ""
+    return _INVALID_CHARS.sub('-', name).strip()
+
 def create_audiobook_path(authors, title, series_title, subtitle, narrators, series_sequence, release_date):
     """Generate the expected file path for an audiobook based on database metadata."""
-    def sanitize_name(name):
-        if name is None:
-            return ""
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            name = name.replace(char, '-')
-        return name.strip()
-
     authors = sanitize_name(authors) or "Unknown Author"
     title = sanitize_name(title) or "Unknown Title"
     series_title = sanitize_name(series_title)
@@ -40,45 +85,114 @@ def create_audiobook_path(authors, title, series_title, subtitle, narrators, ser
     narrators = sanitize_name(narrators) or "Unknown Narrator"
     
     if use_folders:
-        directory = audiobook_directory + "/" + authors + "/"
-        if series_title and series_sequence:
-            directory = directory + series_title + "/" + str(series_sequence) + " - "
+        parts = [audiobook_directory, authors]
         
         year = release_date.split("-")[0] if release_date and "-" in release_date else release_date or "Unknown"
-        directory = directory + year + " - " + title
+        book_folder = f"{year} - {title}"
+        
+        if series_title and series_sequence:
+            parts.append(series_title)
+            book_folder = f"{series_sequence} - {book_folder}"
         
         if subtitle:
-            directory = directory + " - " + subtitle
-        directory = directory + " {" + narrators + "}/"
+            book_folder += f" - {subtitle}"
+        parts.append(f"{book_folder} {{{narrators}}}")
         
-        return directory
+        # Join all components once rather than concatenating segment by segment
+        return str(Path(*parts)) + "/"
     else:
         return audiobook_directory + "/"
 
-def find_audiobook_files(base_path, asin):
-    """Find all possible audiobook files for a given ASIN."""
-    files = []
-    extensions = ['.m4b', '.aax', '.aaxc']
-    
-    if os.path.exists(base_path):
-        for root, dirs, filenames in os.walk(base_path):
-            for filename in filenames:
-                if any(filename.endswith(ext) for ext in extensions):
-                    if asin in filename:
-                        files.append(os.path.join(root, filename))
-    
-    return files
+def iter_audiobook_files(base_path):
+    """Yield a DirEntry for every audiobook file under base_path.
+    
+    Uses os.scandir so file types come from the directory listing and a
+    caller needing the size pays for at most one cached stat per file.
+    """
+    stack = [base_path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(_AUDIO_EXTS):
+                        yield entry
+        except OSError:
+            continue  # Missing or unreadable directory
+
+def scan_library(base_path, db_asins):
+    """Walk base_path once, indexing audiobook files by ASIN and collecting orphans.
+    
+    Returns (index, orphaned): index maps each ASIN in db_asins to the files
+    whose names contain it; orphaned lists files whose name prefix isn't a known ASIN.
+    """
+    index = {}
+    orphaned = []
+    
+    # Empty ASINs would match every name. Checking each window of an ASIN's length
+    # against the set finds every ASIN a name contains, with no per-ASIN scan.
+    asins = {asin for asin in db_asins if asin}
+    lengths = sorted({len(asin) for asin in asins})
+    for entry in iter_audiobook_files(base_path):
+        name = entry.name
+        for length in lengths:
+            for start in range(len(name) - length + 1):
+                candidate = name[start:start + length]
+                if candidate in asins:
+                    paths = index.setdefault(candidate, [])
+                    if not paths or paths[-1] != entry.path:
+                        paths.append(entry.path)
+        
+        # Try to extract ASIN from filename
+        head, sep, _ = name.partition('_')
+        if sep and head and head not in asins:
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                size = 0
+            orphaned.append({
+                'file': entry.path,
+                'asin': head,
+                'size': size
+            })
+    
+    return index, orphaned
+
+def verify_mp4_integrity(filepath):
+    """Verify an unencrypted MP4 by parsing its header atoms with mutagen."""
+    info = MP4(filepath).info
+    return {
+        'valid': True,
+        'duration': info.length,
+        'has_audio': info.channels > 0,
+        'format': 'mov,mp4,m4a,3gp,3g2,mj2',
+        'size': os.path.getsize(filepath),
+        'bitrate': str(info.bitrate)
+    }
 
 def verify_file_integrity(filepath):
     """Verify basic file integrity using ffprobe."""
+    # Converted .m4b files aren't encrypted, so mutagen can check them without a subprocess;
+    # .aax/.aaxc and anything mutagen rejects still go through ffprobe
+    if MP4 is not None and filepath.endswith('.m4b'):
+        try:
+            return verify_mp4_integrity(filepath)
+        except Exception:
+            pass  # Malformed atoms can raise more than MutagenError; let ffprobe decide
+    
     try:
+        # Ask only for the fields checked below; -v error still reports why a file fails
         result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', 
-            '-show_format', '-show_streams', filepath
-        ], capture_output=True, text=True, timeout=30)
+            'ffprobe', '-v', 'error', '-probesize', '5M', '-analyzeduration', '5M',
+            '-select_streams', 'a',
+            '-show_entries', 'format=duration,format_name,size,bit_rate:stream=codec_type',
+            '-of', 'json', filepath
+        ], stdin=subprocess.DEVNULL, capture_output=True, timeout=30)
         
         if result.returncode == 0:
-            data = json.loads(result.stdout)
+            # Parse the raw bytes; decoding to str first would walk the output twice
+            data = _json.loads(result.stdout)
             format_info = data.get('format', {})
             streams = data.get('streams', [])
             
@@ -97,7 +211,7 @@ def verify_file_integrity(filepath):
         else:
             return {
                 'valid': False,
-                'error': result.stderr or 'Unknown ffprobe error'
+                'error': result.stderr.decode('utf-8', 'replace') or 'Unknown ffprobe error'
             }
     except subprocess.TimeoutExpired:
         return {'valid': False, 'error': 'Timeout during verification'}
@@ -106,48 +220,147 @@ def verify_file_integrity(filepath):
     except Exception as e:
         return {'valid': False, 'error': str(e)}
 
-def scan_orphaned_files():
-    """Find audiobook files that aren't tracked in the database."""
-    orphaned = []
-    
-    if not os.path.exists(audiobook_directory):
-        return orphaned
+def quick_verify(filepath):
+    """Check the container header and size without running ffprobe."""
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(12)
+            size = os.fstat(f.fileno()).st_size
+    except OSError as e:
+        return {'valid': False, 'error': str(e)}
     
-    # Get all ASINs from database
-    con = sqlite3.connect(config + "/audiobooks.db")
-    cur = con.cursor()
-    db_asins = set()
+    # M4B, AAX and AAXC are all MP4 containers, which start with an ftyp box
+    if size < 1024:
+        return {'valid': False, 'error': f'File too small ({size} bytes)'}
+    if head[4:8] != b'ftyp':
+        return {'valid': False, 'error': 'Missing MP4 ftyp header'}
+    return {'valid': True, 'size': size}
+
+def quick_verify_many(files_to_verify, jobs):
+    """Run quick_verify over (asin, filepath, book) entries, yielding (asin, filepath, book, integrity).
+    
+    The open/read/stat calls release the GIL, so a thread pool keeps many of
+    them in flight, which matters most on network-mounted libraries.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = executor.map(quick_verify, [filepath for _, filepath, _ in files_to_verify])
+        for (asin, filepath, book), integrity in zip(files_to_verify, results):
+            yield asin, filepath, book, integrity
+
+def load_probe_cache(con):
+    """Load cached ffprobe results as path -> (mtime_ns, size, integrity)."""
+    cache = {}
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ffprobe_cache'").fetchone():
+        return cache
+    
+    for path, mtime_ns, size, duration, has_audio, format_name, bitrate in con.execute('SELECT * FROM ffprobe_cache'):
+        cache[path] = (mtime_ns, size, {
+            'valid': True,
+            'duration': duration,
+            'has_audio': bool(has_audio),
+            'format': format_name,
+            'size': size,
+            'bitrate': bitrate
+        })
+    return cache
+
+def save_probe_cache(con, cache, files_to_verify, updates):
+    """Store probe results from verify_files and drop entries for files that are gone or failed."""
+    current = {filepath for _, filepath, _ in files_to_verify}
+    stale = [(path,) for path in cache if path not in current or (path in updates and updates[path] is None)]
+    rows = [row for row in updates.values() if row]
     
     try:
-        for row in cur.execute('SELECT asin FROM audiobooks').fetchall():
-            db_asins.add(row[0])
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS ffprobe_cache (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                size INTEGER,
+                duration REAL,
+                has_audio INTEGER,
+                format TEXT,
+                bitrate TEXT
+            )
+        ''')
+        con.execute('BEGIN')
+        try:
+            con.executemany('DELETE FROM ffprobe_cache WHERE path = ?', stale)
+            con.executemany('INSERT OR REPLACE INTO ffprobe_cache VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        except sqlite3.Error:
+            con.execute('ROLLBACK')
+            raise
+        con.execute('COMMIT')
     except sqlite3.Error as e:
-        print(f"Database error while getting ASINs: {e}")
-        return orphaned
-    finally:
-        con.close()
+        print(f"⚠️  Could not update ffprobe cache: {e}")
+
+def verify_files(files_to_verify, jobs, cache, updates):
+    """Verify (asin, filepath, book) entries, yielding (asin, filepath, book, integrity).
+    
+    Files unchanged since they last passed ffprobe reuse the cached result; the
+    rest are probed in parallel. Each probed path is recorded in updates as its
+    cache row, or None when it failed, for save_probe_cache.
+    """
+    pending = []
+    for asin, filepath, book in files_to_verify:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            st = None
+        cached = cache.get(filepath) if st else None
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            yield asin, filepath, book, cached[2]
+        else:
+            pending.append((asin, filepath, book, st))
+    
+    if not pending:
+        return
     
-    # Scan for audiobook files
-    extensions = ['.m4b', '.aax', '.aaxc']
-    for root, dirs, files in os.walk(audiobook_directory):
-        for file in files:
-            if any(file.endswith(ext) for ext in extensions):
-                filepath = os.path.join(root, file)
-                
-                # Try to extract ASIN from filename
-                potential_asin = file.split('_')[0] if '_' in file else None
-                
-                if potential_asin and potential_asin not in db_asins:
-                    orphaned.append({
-                        'file': filepath,
-                        'asin': potential_asin,
-                        'size': os.path.getsize(filepath) if os.path.exists(filepath) else 0
-                    })
-    
-    return orphaned
+    # Only passing results are cached; a failure may be transient, such as a timeout
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {executor.submit(verify_file_integrity, filepath): (asin, filepath, book, st)
+                   for asin, filepath, book, st in pending}
+        
+        for future in as_completed(futures):
+            asin, filepath, book, st = futures[future]
+            integrity = future.result()
+            if integrity['valid'] and st:
+                updates[filepath] = (filepath, st.st_mtime_ns, st.st_size, integrity['duration'],
+                                     int(integrity['has_audio']), integrity['format'], integrity['bitrate'])
+            else:
+                updates[filepath] = None
+            yield asin, filepath, book, integrity
 
-def fix_missing_files(missing_asins, dry_run=False):
-    """Reset download status for missing files so they get re-downloaded."""
+def reset_downloads(con, asins):
+    """Reset download status for several ASINs in one transaction.
+    
+    Returns a dict of ASIN -> (title, authors) for the books that were found.
+    """
+    asins = list(dict.fromkeys(asins))
+    books = {}
+    
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        con.executemany('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?', [(asin,) for asin in asins])
+        
+        # Read the titles back in chunks to stay under SQLite's bound parameter limit
+        for i in range(0, len(asins), _LOOKUP_BATCH_SIZE):
+            chunk = asins[i:i + _LOOKUP_BATCH_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            for asin, title, authors in con.execute(
+                    f'SELECT asin, title, authors FROM audiobooks WHERE asin IN ({placeholders})', chunk):
+                books[asin] = (title, authors)
+    except sqlite3.Error:
+        con.execute('ROLLBACK')
+        raise
+    con.execute('COMMIT')
+    
+    return books
+
+def fix_missing_files(missing_asins, dry_run=False, con=None):
+    """Reset download status for missing files so they get re-downloaded.
+    
+    Pass an open connection to reuse it; otherwise one is opened for the fix.
+    """
     if not missing_asins:
         return 0
     
@@ -159,22 +372,19 @@ def fix_missing_files(missing_asins, dry_run=False):
         return len(missing_asins)
     
     try:
-        con = sqlite3.connect(config + "/audiobooks.db")
-        cur = con.cursor()
+        db = con or open_db()
+        try:
+            books = reset_downloads(db, missing_asins)
+        finally:
+            if db is not con:
+                db.close()
         
         fixed = 0
         for asin in missing_asins:
-            try:
-                cur.execute('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?', [asin])
-                book_info = cur.execute('SELECT title, authors FROM audiobooks WHERE asin = ?', [asin]).fetchone()
-                if book_info:
-                    print(f"   ✅ Reset: {book_info[0]} by {book_info[1]} (ASIN: {asin})")
-                    fixed += 1
-            except sqlite3.Error as e:
-                print(f"   ❌ Error resetting ASIN {asin}: {e}")
-        
-        con.commit()
-        con.close()
+            if asin in books:
+                title, authors = books[asin]
+                print(f"   ✅ Reset: {title} by {authors} (ASIN: {asin})")
+                fixed += 1
         
         print(f"✅ Successfully reset {fixed} books for re-download")
         return fixed
@@ -183,25 +393,26 @@ def fix_missing_files(missing_asins, dry_run=False):
         print(f"❌ Database error during fix: {e}")
         return 0
 
-def fix_corrupted_files(corrupted_files, dry_run=False):
-    """Remove corrupted files and reset download status."""
+def fix_corrupted_files(corrupted_files, dry_run=False, con=None):
+    """Remove corrupted files and reset download status.
+    
+    Pass an open connection to reuse it; otherwise one is opened for the fix.
+    """
     if not corrupted_files:
         return 0
     
     print(f"\n🔧 {'Would fix' if dry_run else 'Fixing'} {len(corrupted_files)} corrupted files...")
     
-    fixed = 0
+    if dry_run:
+        for item in corrupted_files:
+            print(f"   Would delete: {item['file']}")
+            print(f"   Would reset ASIN: {item['asin']}")
+        return len(corrupted_files)
+    
+    # Remove corrupted files, collecting the ASINs whose files are gone
+    deleted_asins = []
     for item in corrupted_files:
-        asin = item['asin']
         filepath = item['file']
-        
-        if dry_run:
-            print(f"   Would delete: {filepath}")
-            print(f"   Would reset ASIN: {asin}")
-            fixed += 1
-            continue
-        
-        # Remove corrupted file
         try:
             if os.path.exists(filepath):
                 os.remove(filepath)
@@ -211,29 +422,32 @@ def fix_corrupted_files(corrupted_files, dry_run=False):
         except OSError as e:
             print(f"   ❌ Error deleting {filepath}: {e}")
             continue
-        
-        # Reset download status
+        deleted_asins.append(item['asin'])
+    
+    if not deleted_asins:
+        print("✅ Successfully fixed 0 corrupted files")
+        return 0
+    
+    # Reset download status for all of them in one transaction
+    try:
+        db = con or open_db()
         try:
-            con = sqlite3.connect(config + "/audiobooks.db")
-            cur = con.cursor()
-            cur.execute('UPDATE audiobooks SET downloaded = 0 WHERE asin = ?', [asin])
-            con.commit()
-            con.close()
-            
-            book_info_con = sqlite3.connect(config + "/audiobooks.db")
-            book_info_cur = book_info_con.cursor()
-            book_info = book_info_cur.execute('SELECT title, authors FROM audiobooks WHERE asin = ?', [asin]).fetchone()
-            book_info_con.close()
-            
-            if book_info:
-                print(f"   ✅ Reset for re-download: {book_info[0]} by {book_info[1]}")
-                fixed += 1
-                
-        except sqlite3.Error as e:
-            print(f"   ❌ Error resetting download status for ASIN {asin}: {e}")
+            books = reset_downloads(db, deleted_asins)
+        finally:
+            if db is not con:
+                db.close()
+    except sqlite3.Error as e:
+        print(f"   ❌ Error resetting download status: {e}")
+        return 0
     
-    if not dry_run:
-        print(f"✅ Successfully fixed {fixed} corrupted files")
+    fixed = 0
+    for asin in deleted_asins:
+        if asin in books:
+            title, authors = books[asin]
+            print(f"   ✅ Reset for re-download: {title} by {authors}")
+            fixed += 1
+    
+    print(f"✅ Successfully fixed {fixed} corrupted files")
     
     return fixed
 
@@ -273,28 +487,39 @@ def remove_orphaned_files(orphaned_files, dry_run=False):
 def main():
     parser = argparse.ArgumentParser(description='Verify audiobook database and file integrity')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
-    parser.add_argument('--quick', '-q', action='store_true', help='Quick check (skip ffprobe verification)')
+    parser.add_argument('--quick', '-q', action='store_true', help='Quick check (header and size only, skip ffprobe verification)')
     parser.add_argument('--orphans-only', action='store_true', help='Only check for orphaned files')
     parser.add_argument('--fix', '-f', action='store_true', help='Automatically fix issues found')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be fixed without making changes')
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs, help=f'Files to verify in parallel (default: {default_jobs})')
     args = parser.parse_args()
     
     print("🔍 Audiobook Integrity Verification Tool")
     print("=" * 50)
     
-    # Connect to database
+    # Connect to database; this one connection is reused for every query and fix
     try:
-        con = sqlite3.connect(config + "/audiobooks.db")
+        con = open_db()
         cur = con.cursor()
     except sqlite3.Error as e:
         print(f"❌ Error connecting to database: {e}")
         sys.exit(1)
     
+    try:
+        db_asins = {row[0] for row in cur.execute('SELECT asin FROM audiobooks')}
+    except sqlite3.Error as e:
+        print(f"❌ Error querying database: {e}")
+        con.close()
+        sys.exit(1)
+    
+    # Walk the library once, indexing files by ASIN and finding orphans in the same pass
+    index, orphaned_files = scan_library(audiobook_directory, db_asins)
+    
     # Check for orphaned files
     orphaned = []
     if args.orphans_only or args.verbose:
         print("\n📂 Scanning for orphaned files...")
-        orphaned = scan_orphaned_files()
+        orphaned = orphaned_files
         if orphaned:
             print(f"⚠️  Found {len(orphaned)} orphaned files:")
             for item in orphaned:
@@ -307,51 +532,62 @@ def main():
             con.close()
             return
     
-    # Get all books from database
+    # Count books; full rows are streamed in the loop below
     try:
-        books = cur.execute('''
-            SELECT asin, title, subtitle, authors, series_title, narrators, 
-                   series_sequence, release_date, downloaded 
-            FROM audiobooks 
-            ORDER BY authors, series_sequence, title
-        ''').fetchall()
+        total, not_downloaded = cur.execute('SELECT COUNT(*), COALESCE(SUM(downloaded = 0), 0) FROM audiobooks').fetchone()
     except sqlite3.Error as e:
         print(f"❌ Error querying database: {e}")
         con.close()
         sys.exit(1)
     
-    print(f"\n📚 Verifying {len(books)} books from database...")
+    print(f"\n📚 Verifying {total} books from database...")
     
     stats = {
-        'total': len(books),
+        'total': total,
         'downloaded': 0,
         'files_found': 0,
         'files_verified': 0,
         'corrupted': 0,
         'missing': 0,
-        'not_downloaded': 0
+        'not_downloaded': not_downloaded
     }
     
     issues = []
     missing_asins = []
     corrupted_files = []
+    files_to_verify = []
+    
+    # Without folders every book shares the same expected path
+    flat_path = audiobook_directory + "/"
     
+    if args.verbose:
+        for asin, title, authors in cur.execute('''
+            SELECT asin, title, authors FROM audiobooks
+            WHERE downloaded = 0
+            ORDER BY authors, series_sequence, title
+        '''):
+            print(f"📋 {title} by {authors} (ASIN: {asin}) - Not downloaded")
+    
+    # Only downloaded books have files to check, so the rest never leave SQLite
+    books = cur.execute('''
+        SELECT asin, title, subtitle, authors, series_title, narrators, 
+               series_sequence, release_date 
+        FROM audiobooks 
+        WHERE downloaded = 1
+        ORDER BY authors, series_sequence, title
+    ''')
     for book in books:
-        asin, title, subtitle, authors, series_title, narrators, series_sequence, release_date, downloaded = book
-        
-        if downloaded == 0:
-            stats['not_downloaded'] += 1
-            if args.verbose:
-                print(f"📋 {title} by {authors} (ASIN: {asin}) - Not downloaded")
-            continue
+        asin, title, subtitle, authors, series_title, narrators, series_sequence, release_date = book
         
         stats['downloaded'] += 1
         
-        # Generate expected path
-        expected_path = create_audiobook_path(authors, title, series_title, subtitle, narrators, series_sequence, release_date)
-        
-        # Find actual files
-        files = find_audiobook_files(expected_path if use_folders else audiobook_directory, asin)
+        # Find actual files, limited to the book's own folder when using folders
+        files = index.get(asin, [])
+        if use_folders:
+            expected_path = create_audiobook_path(authors, title, series_title, subtitle, narrators, series_sequence, release_date)
+            files = [filepath for filepath in files if filepath.startswith(expected_path)]
+        else:
+            expected_path = flat_path
         
         if not files:
             stats['missing'] += 1
@@ -371,33 +607,52 @@ def main():
         if args.verbose:
             print(f"📁 {title} by {authors} (ASIN: {asin}) - Found {len(files)} file(s)")
         
-        # Verify file integrity (unless quick mode)
-        if not args.quick:
-            for filepath in files:
-                integrity = verify_file_integrity(filepath)
-                
-                if integrity['valid']:
-                    stats['files_verified'] += 1
-                    if args.verbose:
-                        duration_hours = integrity['duration'] / 3600
-                        size_mb = integrity['size'] / (1024 * 1024)
-                        print(f"   ✅ {os.path.basename(filepath)} - {duration_hours:.1f}h, {size_mb:.1f}MB")
+        # Queue files for integrity verification
+        files_to_verify.extend((asin, filepath, f"{title} by {authors}") for filepath in files)
+    
+    # Quick mode only checks headers; otherwise files are probed in parallel unless cached.
+    # Results are collected on this thread.
+    probe_cache = {}
+    probe_updates = {}
+    if args.quick:
+        results = quick_verify_many(files_to_verify, args.jobs)
+    else:
+        try:
+            probe_cache = load_probe_cache(con)
+        except sqlite3.Error as e:
+            print(f"⚠️  ffprobe cache unavailable: {e}")
+        results = verify_files(files_to_verify, args.jobs, probe_cache, probe_updates)
+    
+    for asin, filepath, book, integrity in results:
+        if integrity['valid']:
+            stats['files_verified'] += 1
+            if args.verbose:
+                size_mb = integrity['size'] / (1024 * 1024)
+                if 'duration' in integrity:
+                    duration_hours = integrity['duration'] / 3600
+                    print(f"   ✅ {os.path.basename(filepath)} - {duration_hours:.1f}h, {size_mb:.1f}MB")
                 else:
-                    stats['corrupted'] += 1
-                    corrupted_files.append({
-                        'asin': asin,
-                        'file': filepath,
-                        'book': f"{title} by {authors}"
-                    })
-                    issues.append({
-                        'type': 'corrupted',
-                        'book': f"{title} by {authors}",
-                        'asin': asin,
-                        'file': filepath,
-                        'error': integrity.get('error', 'Unknown error')
-                    })
-                    if args.verbose:
-                        print(f"   ❌ {os.path.basename(filepath)} - CORRUPTED: {integrity.get('error', 'Unknown')}")
+                    print(f"   ✅ {os.path.basename(filepath)} - {size_mb:.1f}MB")
+        else:
+            stats['corrupted'] += 1
+            corrupted_files.append({
+                'asin': asin,
+                'file': filepath,
+                'book': book
+            })
+            issues.append({
+                'type': 'corrupted',
+                'book': book,
+                'asin': asin,
+                'file': filepath,
+                'error': integrity.get('error', 'Unknown error')
+            })
+            if args.verbose:
+                print(f"   ❌ {os.path.basename(filepath)} - CORRUPTED: {integrity.get('error', 'Unknown')}")
+    
+    # Update the probe cache once every result is in; a dry run leaves the database untouched
+    if not args.quick and not args.dry_run:
+        save_probe_cache(con, probe_cache, files_to_verify, probe_updates)
     
     # Print summary
     print("\n" + "=" * 50)
@@ -408,9 +663,8 @@ def main():
     print(f"Not downloaded: {stats['not_downloaded']}")
     print(f"Files found: {stats['files_found']}")
     
-    if not args.quick:
-        print(f"Files verified: {stats['files_verified']}")
-        print(f"Corrupted files: {stats['corrupted']}")
+    print(f"Files verified: {stats['files_verified']}")
+    print(f"Corrupted files: {stats['corrupted']}")
     
     print(f"Missing files: {stats['missing']}")
     
@@ -439,11 +693,11 @@ def main():
         
         # Fix missing files
         if missing_asins:
-            total_fixed += fix_missing_files(missing_asins, args.dry_run)
+            total_fixed += fix_missing_files(missing_asins, args.dry_run, con)
         
         # Fix corrupted files
         if corrupted_files:
-            total_fixed += fix_corrupted_files(corrupted_files, args.dry_run)
+            total_fixed += fix_corrupted_files(corrupted_files, args.dry_run, con)
         
         # Remove orphaned files (only if explicitly requested)
         if orphaned and args.verbose and len(orphaned) > 0:
@@ -7,6 +7,7 @@ param(
     [switch]$OrphansOnly,
     [switch]$Fix,
     [switch]$DryRun,
+    [int]$Jobs = 0,
     [switch]$Help
 )
 
@@ -20,10 +21,11 @@ if ($Help) {
     Write-Host ""
     Write-Host "Options:"
     Write-Host "  -Verbose      Show detailed output for each file"
-    Write-Host "  -Quick        Skip ffprobe verification (faster)"
+    Write-Host "  -Quick        Check headers and sizes only, skip ffprobe (faster)"
     Write-Host "  -OrphansOnly  Only check for orphaned files"
     Write-Host "  -Fix          Automatically fix issues found"
     Write-Host "  -DryRun       Show what would be fixed without making changes"
+    Write-Host "  -Jobs N       Number of files to verify in parallel"
     Write-Host "  -Help         Show this help message"
     Write-Host ""
     Write-Host "Examples:"
@@ -55,6 +57,7 @@ if ($Quick) { $args += "--quick" }
 if ($OrphansOnly) { $args += "--orphans-only" }
 if ($Fix) { $args += "--fix" }
 if ($DryRun) { $args += "--dry-run" }
+if ($Jobs -gt 0) { $args += "--jobs $Jobs" }
 
 # Run the verification script inside the container
 $command = "python /app/verify_integrity.py " + ($args -join " ")